@@ -0,0 +1,13 @@
+# _clients.py
+# ---------------------------------------------------------
+# 🎯 Purpose: Shared HTTP clients for every CineMind agent, so LLM and
+# embedding calls reuse one connection pool (one TLS handshake per host).
+
+import httpx
+
+# === Connection pool sizing (shared by the sync and async clients) ===
+limits = httpx.Limits(max_connections=100, max_keepalive_connections=50)
+
+# === Shared clients (HTTP/2, pooled connections) ===
+http_client = httpx.Client(http2=True, limits=limits)
+async_http_client = httpx.AsyncClient(http2=True, limits=limits)
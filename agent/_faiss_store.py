@@ -0,0 +1,237 @@
+# _faiss_store.py
+# ---------------------------------------------------------
+# 🎯 Purpose: Load CineMind's FAISS index once per process and share it
+# (index, metadata table, query embeddings) across every consumer.
+
+import os
+import json
+import mmap
+import pickle
+import hashlib
+import zipfile
+import threading
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import faiss
+import httpx
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from dotenv import load_dotenv
+from langchain_openai import OpenAIEmbeddings
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+from langchain.embeddings import CacheBackedEmbeddings
+from langchain.storage import LocalFileStore
+
+try:
+    from ._clients import http_client, async_http_client
+except ImportError:
+    from _clients import http_client, async_http_client
+
+# === Load API key ===
+load_dotenv()
+openai_api_key = os.getenv("OPENAI_API_KEY")
+
+# === Constants ===
+FAISS_DIR = "data/faiss_index"
+FAISS_URL = "https://github.com/VineetKiragi/CineMind/releases/download/v0.1.0/faiss_index.zip"
+FAISS_ZIP = os.path.join(FAISS_DIR, "faiss_index.zip")
+FAISS_SHA256_URL = FAISS_URL + ".sha256"
+DOWNLOAD_WORKERS = 8  # parallel HTTP range requests
+INDEX_PATH = os.path.join(FAISS_DIR, "index.faiss")
+DOCSTORE_PATH = os.path.join(FAISS_DIR, "index.pkl")
+METADATA_PATH = os.path.join(FAISS_DIR, "metadata.parquet")
+EMBEDDING_CONFIG_PATH = os.path.join(FAISS_DIR, "embedding.json")
+FAISS_NPROBE = int(os.getenv("FAISS_NPROBE", "16"))  # IVF lists scanned per query
+EMBED_CACHE_DIR = ".embed_cache"
+METADATA_COLUMNS = ["title", "year", "genres", "director", "rating"]
+os.makedirs(FAISS_DIR, exist_ok=True)
+
+# === Download helpers ===
+def _download_range(client, start, end):
+    """Streams bytes [start, end] of the release archive into its slot in FAISS_ZIP."""
+    with client.stream("GET", FAISS_URL, headers={"Range": f"bytes={start}-{end}"}) as r:
+        if r.status_code != 206:
+            raise RuntimeError(f"range request not honoured (HTTP {r.status_code})")
+        with open(FAISS_ZIP, "r+b") as f:
+            f.seek(start)
+            for chunk in r.iter_bytes(1 << 20):
+                f.write(chunk)
+
+
+def _download_stream(client):
+    """Single-connection fallback when the server does not support ranges."""
+    with client.stream("GET", FAISS_URL) as r:
+        r.raise_for_status()
+        with open(FAISS_ZIP, "wb") as f:
+            for chunk in r.iter_bytes(1 << 20):
+                f.write(chunk)
+
+
+def _verify_checksum(client):
+    """Checks FAISS_ZIP against the published .sha256 file, if the release has one."""
+    r = client.get(FAISS_SHA256_URL)
+    if r.status_code == 404:
+        print("⚠️ No published checksum for the FAISS index — skipping verification.")
+        return
+    r.raise_for_status()
+    expected = r.text.split()[0].lower()
+
+    digest = hashlib.sha256()
+    with open(FAISS_ZIP, "rb") as f:
+        while chunk := f.read(1 << 20):
+            digest.update(chunk)
+    if digest.hexdigest() != expected:
+        raise RuntimeError(f"checksum mismatch for {FAISS_ZIP}")
+
+
+def download_index():
+    """Fetches the release archive with parallel range requests, verifies and extracts it."""
+    with httpx.Client(follow_redirects=True, timeout=60) as client:
+        head = client.head(FAISS_URL)
+        head.raise_for_status()
+        size = int(head.headers.get("content-length", 0))
+
+        if size and head.headers.get("accept-ranges") == "bytes":
+            with open(FAISS_ZIP, "wb") as f:
+                f.truncate(size)  # pre-allocate so each worker writes its own segment
+            step = -(-size // DOWNLOAD_WORKERS)
+            ranges = [(start, min(start + step, size) - 1) for start in range(0, size, step)]
+            with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as pool:
+                list(pool.map(lambda r: _download_range(client, *r), ranges))
+        else:
+            _download_stream(client)
+
+        _verify_checksum(client)
+
+    with zipfile.ZipFile(FAISS_ZIP, "r") as zip_ref:
+        zip_ref.extractall(FAISS_DIR)
+    os.unlink(FAISS_ZIP)
+
+
+# === Ensure FAISS index is present ===
+if not os.path.exists(INDEX_PATH):
+    print("⚠️ FAISS index missing — downloading from GitHub release...")
+    try:
+        download_index()
+        print("✅ FAISS index downloaded and extracted successfully.")
+    except Exception as e:
+        if os.path.exists(FAISS_ZIP):
+            os.unlink(FAISS_ZIP)
+        raise RuntimeError(f"❌ Failed to download FAISS index: {e}")
+
+# === Query embeddings (must match the model the index was built with) ===
+if os.path.exists(EMBEDDING_CONFIG_PATH):
+    with open(EMBEDDING_CONFIG_PATH, "r", encoding="utf-8") as f:
+        embedding_config = json.load(f)
+else:
+    # Indexes built before embedding.json existed (e.g. the v0.1.0 release)
+    embedding_config = {"model": "text-embedding-3-large", "dimensions": None}
+
+base_embeddings = OpenAIEmbeddings(
+    model=embedding_config["model"],
+    dimensions=embedding_config["dimensions"],
+    api_key=openai_api_key,
+    http_client=http_client,
+    http_async_client=async_http_client,
+)
+
+# Query embeddings are cached on disk, keyed by SHA-256 of the query text,
+# so repeated profiles skip the OpenAI round-trip entirely.
+embeddings = CacheBackedEmbeddings.from_bytes_store(
+    base_embeddings,
+    LocalFileStore(EMBED_CACHE_DIR),
+    namespace=f"{embedding_config['model']}-{embedding_config['dimensions'] or 'full'}",
+    query_embedding_cache=True,
+    key_encoder="sha256",
+)
+
+# === Load FAISS index (memory-mapped, pages shared via the OS page cache) ===
+faiss_index = faiss.read_index(INDEX_PATH, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+try:
+    faiss.extract_index_ivf(faiss_index).nprobe = FAISS_NPROBE
+except RuntimeError:
+    pass  # flat index (no inverted lists to probe)
+
+# Inner-product indexes hold unit vectors (cosine); older L2 indexes take raw queries
+use_cosine = faiss_index.metric_type == faiss.METRIC_INNER_PRODUCT
+
+# === Search on the GPU when one is available (faiss-gpu builds only) ===
+# GPU indexes are not safe for concurrent searches, so searches on one are serialized
+gpu_search_lock = None
+if hasattr(faiss, "StandardGpuResources") and faiss.get_num_gpus() > 0:
+    try:
+        gpu_resources = faiss.StandardGpuResources()
+        faiss_index = faiss.index_cpu_to_gpu(gpu_resources, 0, faiss_index)
+        gpu_search_lock = threading.Lock()
+        print("✅ FAISS index moved to GPU 0.")
+    except RuntimeError as e:
+        print(f"⚠️ Could not move FAISS index to GPU, searching on CPU: {e}")
+
+
+def search_index(q, k):
+    """Searches the shared index; every consumer goes through here so GPU searches
+    hold gpu_search_lock (CPU searches run concurrently)."""
+    if gpu_search_lock is None:
+        return faiss_index.search(q, k)
+    with gpu_search_lock:
+        return faiss_index.search(q, k)
+
+
+class _SharedIndex:
+    """Index handle for the LangChain view: search() goes through search_index."""
+
+    def __init__(self, index):
+        self._index = index
+
+    def search(self, q, k, *args, **kwargs):
+        return search_index(q, k)
+
+    def __getattr__(self, name):
+        return getattr(self._index, name)
+
+
+def load_docstore():
+    """Reads LangChain's pickled (docstore, index_to_docstore_id) pair."""
+    with open(DOCSTORE_PATH, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return pickle.load(mm)
+
+
+# === Load metadata table (Arrow, columnar; row i ↔ FAISS id i) ===
+if os.path.exists(METADATA_PATH):
+    metadata_table = pq.read_table(METADATA_PATH, columns=METADATA_COLUMNS)
+else:
+    # Older indexes only ship LangChain's pickled docstore
+    docstore, index_to_docstore_id = load_docstore()
+    metadata_table = pa.Table.from_pylist([
+        {col: docstore.search(index_to_docstore_id[i]).metadata.get(col) for col in METADATA_COLUMNS}
+        for i in range(faiss_index.ntotal)
+    ])
+    del docstore, index_to_docstore_id
+genres = metadata_table["genres"].cast(pa.list_(pa.string()))
+metadata_table = metadata_table.set_column(
+    metadata_table.schema.get_field_index("genres"), "genres", pc.fill_null(genres, pa.scalar([], genres.type))
+).combine_chunks()  # single chunk per column keeps take() cheap
+del genres
+
+
+@lru_cache(maxsize=1)
+def get_vectorstore():
+    """LangChain view over the shared index, for callers that need full documents."""
+    docstore, index_to_docstore_id = load_docstore()
+    with warnings.catch_warnings():
+        # normalize_L2 + MAX_INNER_PRODUCT is cosine similarity; LangChain warns about it anyway
+        warnings.simplefilter("ignore", UserWarning)
+        return FAISS(
+            embedding_function=embeddings,
+            index=_SharedIndex(faiss_index),
+            docstore=docstore,
+            index_to_docstore_id=index_to_docstore_id,
+            normalize_L2=use_cosine,
+            distance_strategy=(
+                DistanceStrategy.MAX_INNER_PRODUCT if use_cosine else DistanceStrategy.EUCLIDEAN_DISTANCE
+            ),
+        )
@@ -3,27 +3,46 @@
 # 🎯 Purpose: Transform retrieved movie candidates + user profile
 # into a conversational, ranked recommendation message.
 
-import os, json
+import os
+import asyncio
+import numbers
+import orjson
+import pyarrow as pa
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 
+try:
+    from ._clients import http_client, async_http_client
+except ImportError:
+    from _clients import http_client, async_http_client
+
 load_dotenv()
 openai_api_key = os.getenv("OPENAI_API_KEY")
 
+# Set CURATOR_USE_LLM=0 to skip the LLM and render picks from a template
+USE_LLM_BLURBS = os.getenv("CURATOR_USE_LLM", "1") != "0"
+MAX_PICKS = 5
+
 # === Initialize LLM ===
-llm = ChatOpenAI(model="gpt-4-turbo", temperature=0.7, api_key=openai_api_key)
+llm = ChatOpenAI(
+    model="gpt-4o-mini",
+    temperature=0.7,
+    api_key=openai_api_key,
+    http_client=http_client,
+    http_async_client=async_http_client,
+)
 
 # === Prompt template ===
 template = """
 You are CineMind's Content Curator Agent.
 You receive:
 1. A JSON object describing the user's preferences.
-2. A list of candidate movies with metadata (title, year, genres, rating, etc.).
+2. A shortlist of movies, already ranked best match first (title, year, genres, rating).
 
 Your job:
-- Select the 3–5 best recommendations that best fit the user's taste.
+- Present every movie in the given order, starting each one with **Title (Year)**.
 - Explain *why* each movie suits the user, referencing tone, genre, era, or theme.
 - Write naturally, like a friendly movie expert.
 - Keep the tone engaging and concise (about 1–2 sentences per movie).
@@ -31,40 +50,75 @@ Your job:
 User Profile:
 {profile}
 
-Candidate Movies:
+Recommended Movies:
 {candidates}
 
 Return your final recommendations as a conversational paragraph list.
 """
 
-prompt = ChatPromptTemplate.from_template(template)
+# Plain f-string template: rendered once per call with no chat-message wrapping
+prompt = PromptTemplate.from_template(template, template_format="f-string")
 curation_chain = prompt | llm | StrOutputParser()
 
-def curate_recommendations(profile_json: str, candidate_list: list):
+# Only these fields reach the prompt; director/score just add tokens
+PROMPT_FIELDS = ("title", "year", "genres", "rating")
+
+def select_top_candidates(candidate_list: list, n=MAX_PICKS):
+    """
+    Deduplicates by title and keeps the n best matches. Candidates arrive
+    ranked by embedding similarity to the profile query, so this is the rerank.
+    """
+    unique = {}
+    for c in candidate_list:
+        unique.setdefault(c.get("title"), c)
+    return list(unique.values())[:n]
+
+
+def format_recommendations(picks: list):
+    """Template fallback: one markdown line per pick, no LLM call."""
+    lines = []
+    for c in picks:
+        year = c.get("year")
+        year_str = f" ({int(year)})" if isinstance(year, numbers.Real) and year == year else ""
+        genres = ", ".join(c.get("genres") or []) or "Movie"
+        lines.append(f"- **{c.get('title')}{year_str}** — {genres}, rated {c.get('rating')}")
+    return "Here are CineMind's picks for you:\n\n" + "\n".join(lines)
+
+
+async def curate_recommendations(profile: dict, candidate_list, use_llm=USE_LLM_BLURBS):
     """
-    Given a user profile (JSON str) and candidate list (list of dicts),
-    return CineMind's curated recommendation message.
+    Given a user profile (dict) and candidates (Arrow table from the
+    Trend Analyst, or a list of dicts), return CineMind's curated
+    recommendation message.
     """
-    # Pretty-format candidates for prompt readability
-    candidates_str = json.dumps(candidate_list, indent=2)
+    if isinstance(candidate_list, pa.Table):
+        # Rows become dicts only here, where they are rendered or JSON-encoded
+        candidate_list = candidate_list.slice(0, MAX_PICKS).to_pylist()
+    picks = select_top_candidates(candidate_list)
     print("\n🎨 Curating final recommendations...\n")
-    result = curation_chain.invoke({
-        "profile": profile_json,
-        "candidates": candidates_str
-    })
+    if use_llm:
+        # Compact payload (fewer input tokens); the LLM only writes the blurbs
+        compact = [{k: c.get(k) for k in PROMPT_FIELDS} for c in picks]
+        candidates_str = orjson.dumps(compact, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+        result = await curation_chain.ainvoke({
+            "profile": orjson.dumps(profile).decode(),
+            "candidates": candidates_str
+        })
+    else:
+        result = format_recommendations(picks)
     print("🧠 CineMind Curator Output:\n")
     print(result)
     return result
 
 # === Example usage ===
 if __name__ == "__main__":
-    sample_profile = json.dumps({
+    sample_profile = {
         "genres": ["romance", "comedy"],
         "tone": ["light-hearted"],
         "decade": ["2000s"],
         "people": [],
         "other_preferences": ["feel-good", "happy ending"]
-    })
+    }
 
     sample_candidates = [
         {"title": "Serendipity", "year": 2001, "genres": ["Comedy","Romance"], "rating": 7.3},
@@ -73,4 +127,4 @@ if __name__ == "__main__":
         {"title": "(500) Days of Summer", "year": 2009, "genres": ["Comedy","Drama","Romance"], "rating": 7.7}
     ]
 
-    curate_recommendations(sample_profile, sample_candidates)
+    asyncio.run(curate_recommendations(sample_profile, sample_candidates))
@@ -4,8 +4,11 @@
 # (Profiler → Trend Analyst → Content Curator)
 
 import json
+import re
+import asyncio
 import sys
 import os
+import orjson
 
 # Add parent directory to path for flexible imports
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -21,25 +24,37 @@ except ImportError:
     from trend_analyst import analyze_trends
     from content_curator import curate_recommendations
 
+# Markdown fences some LLMs still wrap around JSON output
+FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```$", flags=re.M)
 
-def run_cinemind_pipeline(user_query: str):
+
+def parse_profile(profile_output: str, strict=False) -> dict:
+    """Parses the profiler's JSON once. Malformed output yields an empty profile,
+    or raises ValueError when strict (so callers can surface profiler failures)."""
+    try:
+        profile = orjson.loads(FENCE_RE.sub("", profile_output.strip()))
+    except orjson.JSONDecodeError as e:
+        if strict:
+            raise ValueError(f"profiler returned malformed JSON: {e}") from e
+        return {}
+    if not isinstance(profile, dict):
+        if strict:
+            raise ValueError("profiler returned JSON that is not an object")
+        return {}
+    return profile
+
+
+async def run_cinemind_pipeline(user_query: str):
     print(f"\n🎬 User Query: {user_query}\n{'-'*70}")
 
     # --- Step 1: Profile user intent ---
-    profile_output = extract_user_profile(user_query)
-
-    # Some LLMs wrap JSON in backticks or markdown → clean it
-    cleaned = (
-        profile_output.replace("```json", "")
-        .replace("```", "")
-        .strip()
-    )
+    profile = parse_profile(await extract_user_profile(user_query))
 
     # --- Step 2: Retrieve candidate movies ---
-    candidates = analyze_trends(cleaned, k=8)
+    candidates = await analyze_trends(profile, k=8)
 
     # --- Step 3: Curate final recommendations ---
-    final_output = curate_recommendations(cleaned, candidates)
+    final_output = await curate_recommendations(profile, candidates)
 
     print("\n✅ CineMind Final Recommendation:\n")
     print(final_output)
@@ -53,5 +68,7 @@ if __name__ == "__main__":
         "Suggest deep sci-fi dramas about human emotion and space exploration."
     ]
 
-    for q in test_queries:
-        run_cinemind_pipeline(q)
+    async def main():
+        await asyncio.gather(*(run_cinemind_pipeline(q) for q in test_queries))
+
+    asyncio.run(main())
@@ -1,50 +1,23 @@
 # agent/trend_analyst.py
 # ---------------------------------------------------------
-# 🎯 Purpose: Retrieve semantically relevant movies from FAISS index
-# using precomputed embeddings (downloaded once if missing).
-
-import os
-import json
-import zipfile
-import urllib.request
-from dotenv import load_dotenv
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import FAISS
-
-# === Load API key ===
-load_dotenv()
-openai_api_key = os.getenv("OPENAI_API_KEY")
-
-# === Constants ===
-FAISS_DIR = "data/faiss_index"
-FAISS_URL = "https://github.com/VineetKiragi/CineMind/releases/download/v0.1.0/faiss_index.zip"
-FAISS_ZIP = os.path.join(FAISS_DIR, "faiss_index.zip")
-os.makedirs(FAISS_DIR, exist_ok=True)
-
-# === Ensure FAISS index is present ===
-if not os.path.exists(os.path.join(FAISS_DIR, "index.faiss")):
-    print("⚠️ FAISS index missing — downloading from GitHub release...")
-    try:
-        urllib.request.urlretrieve(FAISS_URL, FAISS_ZIP)
-        with zipfile.ZipFile(FAISS_ZIP, "r") as zip_ref:
-            zip_ref.extractall(FAISS_DIR)
-        print("✅ FAISS index downloaded and extracted successfully.")
-    except Exception as e:
-        raise RuntimeError(f"❌ Failed to download FAISS index: {e}")
-
-# === Load FAISS index ===
-embeddings = OpenAIEmbeddings(model="text-embedding-3-large", api_key=openai_api_key)
-vectorstore = FAISS.load_local(FAISS_DIR, embeddings, allow_dangerous_deserialization=True)
+# 🎯 Purpose: Retrieve semantically relevant movies from the shared
+# FAISS index (see _faiss_store.py).
+
+import asyncio
+import faiss
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+try:
+    from ._faiss_store import embeddings, search_index, metadata_table, use_cosine
+except ImportError:
+    from _faiss_store import embeddings, search_index, metadata_table, use_cosine
 
 
 # === Utility ===
-def build_search_prompt(profile_json: str):
+def build_search_prompt(profile: dict):
     """Converts structured user preferences into a natural query string."""
-    try:
-        profile = json.loads(profile_json)
-    except json.JSONDecodeError:
-        return "Movies similar to the user's tastes"
-
     parts = []
     if profile.get("genres"):
         parts.append(f"genres: {', '.join(profile['genres'])}")
@@ -57,46 +30,69 @@ def build_search_prompt(profile_json: str):
     if profile.get("other_preferences"):
         parts.append(f"themes: {', '.join(profile['other_preferences'])}")
 
+    if not parts:
+        return "Movies similar to the user's tastes"
     return "Recommend movies that match " + ", ".join(parts)
 
 
 # === Core Retrieval ===
-def analyze_trends(profile_json: str, k=5):
-    """Queries the FAISS vectorstore and returns ranked recommendations."""
-    query = build_search_prompt(profile_json)
+# One wide FAISS pass; filtering, de-duplication and truncation to k happen in memory
+CANDIDATE_POOL_SIZE = 100
+
+
+async def analyze_trends(profile: dict, k=5, min_year=None, min_rating=None):
+    """Queries the FAISS vectorstore and returns ranked recommendations as an
+    Arrow table (title, year, genres, director, rating, score), best match first.
+
+    Optional min_year / min_rating filters are applied to the retrieved pool,
+    so they never trigger a second search.
+    """
+    # The profiler writes the search query itself; older profiles fall back to the template
+    query = profile.get("search_query") or build_search_prompt(profile)
     print(f"\n🔍 Trend Analyst Query: {query}\n")
 
-    results = vectorstore.similarity_search_with_score(query, k=k)
-    recommendations = []
-    seen_titles = set()
-
-    for doc, score in results:
-        title = doc.metadata.get("title", "Unknown")
-        if title not in seen_titles:
-            seen_titles.add(title)
-            recommendations.append({
-                "title": title,
-                "year": doc.metadata.get("year"),
-                "genres": doc.metadata.get("genres"),
-                "director": doc.metadata.get("director"),
-                "rating": float(round(doc.metadata.get("rating", 0), 2)),
-                "score": float(round(score, 3))
-            })
+    q = np.ascontiguousarray([await embeddings.aembed_query(query)], dtype="float32")
+    if use_cosine:
+        faiss.normalize_L2(q)
+    # FAISS releases the GIL while searching; a worker thread keeps the event loop free
+    scores, ids = await asyncio.to_thread(search_index, q, max(k, CANDIDATE_POOL_SIZE))
+    hits = ids[0] >= 0  # IVF may return fewer hits than requested
+    scores, ids = scores[0][hits], ids[0][hits]
+
+    # --- Rerank/filter the pool with columnar ops (best-first order is preserved) ---
+    pool = metadata_table.take(ids)
+    mask = np.ones(len(ids), dtype=bool)
+    if min_year is not None:
+        mask &= pc.fill_null(pc.greater_equal(pool["year"], min_year), False).to_numpy()
+    if min_rating is not None:
+        mask &= pc.fill_null(pc.greater_equal(pool["rating"], min_rating), False).to_numpy()
+    pool, scores = pool.filter(mask), scores[mask]
+
+    # Dictionary codes follow first appearance, so each title's first index is its best hit
+    pool = pool.set_column(pool.schema.get_field_index("title"), "title", pc.fill_null(pool["title"], "Unknown"))
+    codes = pc.dictionary_encode(pool["title"]).combine_chunks().indices.to_numpy()
+    keep = np.sort(np.unique(codes, return_index=True)[1])[:k]
+
+    recommendations = pool.take(keep)
+    recommendations = recommendations.set_column(
+        recommendations.schema.get_field_index("rating"), "rating",
+        pc.round(pc.fill_null(recommendations["rating"], 0.0), 2),
+    ).append_column("score", pc.round(pa.array(scores[keep], pa.float64()), 3))
 
     print("🎞 Top Retrieved Candidates:")
-    for r in recommendations:
-        print(f"• {r['title']} ({r['year']}) | {r['genres']} | Score: {r['score']}")
+    for title, year, genres, score in zip(*(recommendations[c].to_pylist() for c in ("title", "year", "genres", "score"))):
+        print(f"• {title} ({year}) | {genres} | Score: {score}")
 
     return recommendations
 
 
 if __name__ == "__main__":
     # Test mode
-    sample_profile = json.dumps({
+    sample_profile = {
         "genres": ["romance", "comedy"],
         "tone": ["light-hearted"],
         "decade": ["2000s"],
         "people": [],
         "other_preferences": ["feel-good", "happy ending"]
-    })
-    analyze_trends(sample_profile)
+    }
+    asyncio.run(analyze_trends(sample_profile))
@@ -4,15 +4,27 @@
 # Works as the first agent in the CineMind multi-agent pipeline.
 
 import os
+import asyncio
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 
+try:
+    from ._clients import http_client, async_http_client
+except ImportError:
+    from _clients import http_client, async_http_client
+
 load_dotenv()
 openai_api_key = os.getenv("OPENAI_API_KEY")
 
-llm = ChatOpenAI(model="gpt-4-turbo", temperature=0.3, api_key=openai_api_key)
+llm = ChatOpenAI(
+    model="gpt-4-turbo",
+    temperature=0.3,
+    api_key=openai_api_key,
+    http_client=http_client,
+    http_async_client=async_http_client,
+)
 
 # === Prompt template ===
 template = """
@@ -27,20 +39,23 @@ Return a JSON object with keys:
 - "decade": list of decade or period clues
 - "people": list of directors or actors mentioned
 - "other_preferences": any extra info (e.g., story elements, settings, pacing)
+- "search_query": one sentence describing the movies they want, written as a
+  semantic search query over movie plots and metadata
 """
 
-prompt = ChatPromptTemplate.from_template(template)
+# Plain f-string template: rendered once per call with no chat-message wrapping
+prompt = PromptTemplate.from_template(template, template_format="f-string")
 
-# === Chain definition ===
-profile_chain = prompt | llm | StrOutputParser()
+# === Chain definition (JSON mode: the model must return a bare JSON object) ===
+profile_chain = prompt | llm.bind(response_format={"type": "json_object"}) | StrOutputParser()
 
 
-def extract_user_profile(query: str):
+async def extract_user_profile(query: str):
     """
     Run the profiler agent to get structured preferences.
     """
     print(f"\n🎬 Profiling user query: {query}\n")
-    response = profile_chain.invoke({"query": query})
+    response = await profile_chain.ainvoke({"query": query})
     print("🧠 Extracted profile:\n", response)
     return response
 
@@ -52,5 +67,7 @@ if __name__ == "__main__":
         "I like realistic dramas with strong female leads from the 2010s."
     ]
 
-    for q in test_queries:
-        extract_user_profile(q)
+    async def main():
+        await asyncio.gather(*(extract_user_profile(q) for q in test_queries))
+
+    asyncio.run(main())
@@ -2,23 +2,33 @@
 # ---------------------------------------------------------
 # 🎯 Purpose: Expose CineMind's multi-agent reasoning pipeline as REST API endpoints
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
-import os, sys, json
+import os, sys
 
 # Ensure project root is accessible
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from agent.coordinator import run_cinemind_pipeline
+from agent.coordinator import run_cinemind_pipeline, parse_profile
 from agent.user_profiler import extract_user_profile
+from agent._clients import http_client, async_http_client
 
 # ---------------------------------------------------------
 # 🚀 Initialize app
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Agents (and their shared HTTP pool) are created at import; close the pool on shutdown
+    yield
+    await async_http_client.aclose()
+    http_client.close()
+
 app = FastAPI(
     title="CineMind API",
     description="Multi-agent AI movie recommendation API powered by GPT-4 and FAISS.",
-    version="1.0"
+    version="1.0",
+    lifespan=lifespan
 )
 
 # Enable CORS (so React / Next.js / Streamlit can access it)
@@ -39,21 +49,20 @@ class QueryRequest(BaseModel):
 # 🧠 Endpoints
 
 @app.post("/recommend")
-def recommend_movies(request: QueryRequest):
+async def recommend_movies(request: QueryRequest):
     """Main endpoint for CineMind recommendations."""
     try:
-        result = run_cinemind_pipeline(request.query)
+        result = await run_cinemind_pipeline(request.query)
         return {"status": "success", "query": request.query, "recommendations": result}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/profile")
-def extract_profile(request: QueryRequest):
+async def extract_profile(request: QueryRequest):
     """Endpoint for debugging user profiling only."""
     try:
-        profile = extract_user_profile(request.query)
-        cleaned = profile.replace("```json", "").replace("```", "").strip()
-        return {"status": "success", "profile": json.loads(cleaned)}
+        profile = await extract_user_profile(request.query)
+        return {"status": "success", "profile": parse_profile(profile, strict=True)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -3,14 +3,36 @@
 # 🎯 Purpose: Convert movie corpus into OpenAI embeddings and
 # store them in a local FAISS index for semantic retrieval.
 
+import io
 import os
 import json
+import time
+import uuid
+import base64
+import argparse
+import warnings
+import faiss
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openai import OpenAI
 from langchain_openai import OpenAIEmbeddings
 from langchain_community.vectorstores import FAISS
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores.utils import DistanceStrategy
 from langchain_core.documents import Document
 from dotenv import load_dotenv
 from tqdm import tqdm
 
+# === Command-line options ===
+parser = argparse.ArgumentParser(description="Embed the movie corpus and build CineMind's FAISS index.")
+parser.add_argument(
+    "--batch",
+    action="store_true",
+    help="embed through the OpenAI Batch API (half the cost, results within 24h)",
+)
+args = parser.parse_args()
+
 # === Load environment variables ===
 load_dotenv()
 openai_api_key = os.getenv("OPENAI_API_KEY")
@@ -18,33 +40,176 @@ if not openai_api_key:
     raise ValueError("❌ OPENAI_API_KEY not found in .env")
 
 # === File paths ===
-CORPUS_PATH = "data/embeddings_corpus.jsonl"
+CORPUS_PATH = "data/embeddings_corpus.parquet"
 INDEX_DIR = "data/faiss_index"
+EMBED_BATCH_SIZE = 512  # documents per embeddings API request
+BATCH_MAX_INPUTS = 50_000  # Batch API cap on embedding inputs per batch job
+BATCH_POLL_SECONDS = 30
 
-# === Read the corpus ===
-print("📖 Loading corpus from JSONL...")
-documents = []
-with open(CORPUS_PATH, "r", encoding="utf-8") as f:
-    for line in f:
-        rec = json.loads(line)
-        doc = Document(page_content=rec["page_content"], metadata=rec["metadata"])
-        documents.append(doc)
+# === Embedding model ===
+# text-embedding-3 models support Matryoshka truncation: 512-d "small" vectors
+# keep retrieval quality for this corpus at a sixth of the 3072-d "large" size.
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "512"))
 
-print(f"✅ Loaded {len(documents)} documents for embedding.")
+# === Compressed index settings ===
+# Default: OPQ rotation + inverted lists + 32 sub-quantizers × 8 bits (32 bytes/vector).
+# nlist is sized to the corpus (≈39 training points per centroid, capped at 4096).
+# FAISS_INDEX_FACTORY overrides it for any corpus size, e.g. "SQ8" for a simple
+# 4× smaller scalar-quantized flat index.
+DEFAULT_INDEX_FACTORY = "OPQ32_64,IVF{nlist},PQ32x8"
+INDEX_FACTORY = os.getenv("FAISS_INDEX_FACTORY")
+TRAIN_SAMPLE_SIZE = 100_000
+MIN_IVF_SIZE = 10_000  # smaller corpora default to a flat fp16 index
+
+# === Read the corpus ===
+print("📖 Loading corpus from Parquet...")
+corpus = pq.read_table(CORPUS_PATH)
+print(f"✅ Loaded {corpus.num_rows} documents for embedding.")
 
 # === Initialize embeddings ===
-print("⚙️ Creating OpenAI embeddings (text-embedding-3-large)...")
+print(f"⚙️ Creating OpenAI embeddings ({EMBEDDING_MODEL}, {EMBEDDING_DIMENSIONS}-d)...")
 embeddings = OpenAIEmbeddings(
-    model="text-embedding-3-large",
-    api_key=openai_api_key
+    model=EMBEDDING_MODEL,
+    dimensions=EMBEDDING_DIMENSIONS,
+    api_key=openai_api_key,
+    chunk_size=EMBED_BATCH_SIZE
 )
 
-# === Build FAISS index ===
-print("🧠 Generating and indexing embeddings (this may take a few minutes)...")
-vectorstore = FAISS.from_documents(tqdm(documents), embeddings)
 
-# === Save index ===
+def embed_online(texts_column):
+    """Embeds the corpus with synchronous embeddings requests, EMBED_BATCH_SIZE docs each."""
+    batches = []
+    for start in tqdm(range(0, len(texts_column), EMBED_BATCH_SIZE), unit="batch"):
+        texts = texts_column.slice(start, EMBED_BATCH_SIZE).to_pylist()
+        batches.append(np.asarray(embeddings.embed_documents(texts), dtype="float32"))
+    return batches
+
+
+def embed_with_batch_api(texts_column):
+    """Embeds the corpus via the OpenAI Batch API: one JSONL request per
+    EMBED_BATCH_SIZE docs, uploaded as jobs of at most BATCH_MAX_INPUTS inputs."""
+    client = OpenAI(api_key=openai_api_key)
+    starts = list(range(0, len(texts_column), EMBED_BATCH_SIZE))
+    requests_per_job = BATCH_MAX_INPUTS // EMBED_BATCH_SIZE
+
+    # Submit every job up front so OpenAI can process them concurrently
+    jobs = []
+    for i in range(0, len(starts), requests_per_job):
+        buf = io.BytesIO()
+        for start in starts[i:i + requests_per_job]:
+            request = {
+                "custom_id": str(start),
+                "method": "POST",
+                "url": "/v1/embeddings",
+                "body": {
+                    "model": EMBEDDING_MODEL,
+                    "dimensions": EMBEDDING_DIMENSIONS,
+                    "encoding_format": "base64",
+                    "input": texts_column.slice(start, EMBED_BATCH_SIZE).to_pylist(),
+                },
+            }
+            buf.write(json.dumps(request).encode("utf-8") + b"\n")
+        input_file = client.files.create(file=("embeddings_batch.jsonl", buf.getvalue()), purpose="batch")
+        job = client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/embeddings",
+            completion_window="24h",
+        )
+        print(f"📤 Submitted batch {job.id} ({min(requests_per_job, len(starts) - i)} requests)")
+        jobs.append(job)
+
+    # Poll until every job finishes, then collect rows keyed by their start offset
+    results = {}
+    for job in jobs:
+        while job.status not in ("completed", "failed", "expired", "cancelled"):
+            time.sleep(BATCH_POLL_SECONDS)
+            job = client.batches.retrieve(job.id)
+            counts = job.request_counts
+            print(f"⏳ Batch {job.id}: {job.status} ({counts.completed}/{counts.total} requests)")
+        if job.status != "completed" or job.output_file_id is None:
+            raise RuntimeError(f"❌ Batch {job.id} ended with status '{job.status}'")
+
+        for line in client.files.content(job.output_file_id).text.splitlines():
+            result = json.loads(line)
+            response = result["response"]
+            if result.get("error") or response["status_code"] != 200:
+                raise RuntimeError(f"❌ Embedding request {result['custom_id']} failed: {result.get('error') or response['body']}")
+            data = sorted(response["body"]["data"], key=lambda item: item["index"])
+            results[int(result["custom_id"])] = np.vstack([
+                np.frombuffer(base64.b64decode(item["embedding"]), dtype="float32") for item in data
+            ])
+
+    missing = [start for start in starts if start not in results]
+    if missing:
+        raise RuntimeError(f"❌ Batch output is missing {len(missing)} requests (first at row {missing[0]})")
+    return [results[start] for start in starts]
+
+
+# === Embed the corpus (batched embedding requests) ===
+texts_column = corpus.column("page_content")
+if args.batch:
+    print("🧠 Generating embeddings with the OpenAI Batch API (can take up to 24h)...")
+    batches = embed_with_batch_api(texts_column)
+else:
+    print("🧠 Generating embeddings (this may take a few minutes)...")
+    batches = embed_online(texts_column)
+
+# Unit-normalize once so inner product == cosine similarity
+xb = np.ascontiguousarray(np.vstack(batches), dtype="float32")
+del batches
+faiss.normalize_L2(xb)
+ntotal, d = xb.shape
+
+# === Build FAISS index (inner product on normalized vectors) ===
+if INDEX_FACTORY or ntotal >= MIN_IVF_SIZE:
+    nlist = max(1, min(4096, ntotal // 39))
+    factory = (INDEX_FACTORY or DEFAULT_INDEX_FACTORY).format(nlist=nlist)
+    index = faiss.index_factory(d, factory, faiss.METRIC_INNER_PRODUCT)
+else:
+    factory = "SQfp16"
+    index = faiss.IndexScalarQuantizer(d, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_INNER_PRODUCT)
+
+if not index.is_trained:
+    sample_size = min(ntotal, TRAIN_SAMPLE_SIZE)
+    print(f"🗜 Training {factory} index on {sample_size} sampled vectors...")
+    rng = np.random.default_rng(42)
+    index.train(xb[rng.choice(ntotal, size=sample_size, replace=False)])
+index.add(xb)
+print(f"✅ Built {factory} index: {ntotal} vectors, {d}-d")
+
+# === Save index (index.faiss via faiss.write_index + index.pkl docstore) ===
+docstore_ids = [str(uuid.uuid4()) for _ in range(ntotal)]
+docstore = InMemoryDocstore({
+    doc_id: Document(page_content=text, metadata=meta)
+    for doc_id, text, meta in zip(
+        docstore_ids,
+        texts_column.to_pylist(),
+        corpus.column("metadata").to_pylist(),
+    )
+})
+with warnings.catch_warnings():
+    # normalize_L2 + MAX_INNER_PRODUCT is cosine similarity; LangChain warns about it anyway
+    warnings.simplefilter("ignore", UserWarning)
+    vectorstore = FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=dict(enumerate(docstore_ids)),
+        normalize_L2=True,
+        distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT,
+    )
 vectorstore.save_local(INDEX_DIR)
 print(f"✅ FAISS index saved at: {INDEX_DIR}")
 
+# === Record the query-side embedding config ===
+with open(os.path.join(INDEX_DIR, "embedding.json"), "w", encoding="utf-8") as f:
+    json.dump({"model": EMBEDDING_MODEL, "dimensions": EMBEDDING_DIMENSIONS}, f)
+
+# === Save metadata table (row i ↔ FAISS id i) for direct index lookups ===
+metadata_path = os.path.join(INDEX_DIR, "metadata.parquet")
+metadata = corpus.column("metadata").combine_chunks()
+pq.write_table(pa.Table.from_arrays(metadata.flatten(), names=[f.name for f in metadata.type]), metadata_path)
+print(f"✅ Metadata table saved at: {metadata_path}")
+
 print("🎉 Embedding generation complete — CineMind vector store is ready!")
@@ -2,21 +2,18 @@
 # ------------------------------------------------------
 # 🎯 Purpose: Verify FAISS index retrieval works correctly.
 
-import os
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import FAISS
-from dotenv import load_dotenv
+import os, sys
+import asyncio
 
-# === Load environment & embeddings ===
-load_dotenv()
-openai_api_key = os.getenv("OPENAI_API_KEY")
+# Ensure project root is accessible
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-FAISS_PATH = "data/faiss_index"
-embeddings = OpenAIEmbeddings(model="text-embedding-3-large", api_key=openai_api_key)
-vectorstore = FAISS.load_local(FAISS_PATH, embeddings, allow_dangerous_deserialization=True)
+from agent._faiss_store import get_vectorstore
 
-def search_movies(query, k=5):
-    results = vectorstore.similarity_search_with_score(query, k=k)
+vectorstore = get_vectorstore()
+
+async def search_movies(query, k=5):
+    results = await vectorstore.asimilarity_search_with_score(query, k=k)
     print(f"\n🔍 Query: {query}\n")
     for i, (doc, score) in enumerate(results, start=1):
         meta = doc.metadata
@@ -28,6 +25,13 @@ def search_movies(query, k=5):
 
 if __name__ == "__main__":
     # Try some sample queries
-    search_movies("space exploration and artificial intelligence")
-    search_movies("goofy buddy cop action comedy")
-    search_movies("romantic movies directed by Christopher Nolan")
+    sample_queries = [
+        "space exploration and artificial intelligence",
+        "goofy buddy cop action comedy",
+        "romantic movies directed by Christopher Nolan",
+    ]
+
+    async def main():
+        await asyncio.gather(*(search_movies(q) for q in sample_queries))
+
+    asyncio.run(main())
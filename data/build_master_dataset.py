@@ -5,9 +5,18 @@
 
 import pandas as pd
 import numpy as np
-import json
+import pyarrow as pa
+import pyarrow.parquet as pq
 import ast
 import os
+from collections import namedtuple
+
+# Numba is optional: with it, the weighted rating runs as a parallel compiled loop
+try:
+    from numba import njit, prange
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
 
 # === Utility functions ===
 def parse_genres(genre_str):
@@ -64,9 +73,26 @@ def extract_director(x):
     except Exception:
         return None
 
+if HAVE_NUMBA:
+    @njit(parallel=True, cache=True)
+    def _wr(v, R, C, m):
+        """Per-row weighted rating, split across cores with prange."""
+        out = np.empty_like(R)
+        for i in prange(v.shape[0]):
+            total = v[i] + m
+            out[i] = (v[i] / total) * R[i] + (m / total) * C if total > 0 else R[i]
+        return out
+
+
 def compute_weighted_rating(v, R, C, m):
-    """IMDb-style weighted rating."""
-    return (v / (v + m)) * R + (m / (v + m)) * C if (v + m) > 0 else R
+    """IMDb-style weighted rating over NumPy arrays (Numba-compiled when available)."""
+    if HAVE_NUMBA:
+        return _wr(np.ascontiguousarray(v, dtype=np.float64), np.ascontiguousarray(R, dtype=np.float64),
+                   float(C), float(m))
+    total = v + m
+    with np.errstate(divide="ignore", invalid="ignore"):
+        wr = (v / total) * R + (m / total) * C
+    return np.where(total > 0, wr, R)
 
 
 # === Load raw data ===
@@ -86,7 +112,7 @@ movies["id"] = movies["id"].astype(int)
 movies = movies[[
     "id", "title", "overview", "release_date", "vote_average", "vote_count", "genres"
 ]]
-movies["genres"] = movies["genres"].apply(parse_genres)
+movies["genres"] = [parse_genres(g) for g in movies["genres"].tolist()]
 movies["year"] = pd.to_datetime(movies["release_date"], errors="coerce").dt.year
 
 # === Aggregate ratings ===
@@ -101,20 +127,20 @@ ratings_grouped = ratings.groupby("movieId").agg(
 df = movies.merge(ratings_grouped, left_on="id", right_on="movieId", how="left")
 
 # === Add credits (cast/director) ===
-credits["cast_top"] = credits["cast"].apply(extract_cast)
-credits["director"] = credits["crew"].apply(extract_director)
+credits["cast_top"] = [extract_cast(c) for c in credits["cast"].tolist()]
+credits["director"] = [extract_director(c) for c in credits["crew"].tolist()]
 credits = credits[["id", "cast_top", "director"]]
 df = df.merge(credits, on="id", how="left")
 
 # === Add keywords ===
-keywords["keywords"] = keywords["keywords"].apply(parse_keywords)
+keywords["keywords"] = [parse_keywords(k) for k in keywords["keywords"].tolist()]
 df = df.merge(keywords, on="id", how="left")
 
 # === Compute Weighted Rating (IMDb formula) ===
 C = df["vote_average"].mean()
 m = df["vote_count"].quantile(0.8)
-df["weighted_rating"] = df.apply(
-    lambda x: compute_weighted_rating(x["vote_count"], x["vote_average"], C, m), axis=1
+df["weighted_rating"] = compute_weighted_rating(
+    df["vote_count"].to_numpy(dtype=float), df["vote_average"].to_numpy(dtype=float), C, m
 )
 
 # === Drop duplicates & invalid rows ===
@@ -129,34 +155,53 @@ df.to_parquet(master_path, index=False)
 print(f"✅ Saved master dataset to {master_path}")
 
 # === Build embedding corpus (rich text) ===
+CORPUS_SCHEMA = pa.schema([
+    ("page_content", pa.string()),
+    ("metadata", pa.struct([
+        ("id", pa.int64()),
+        ("title", pa.string()),
+        ("year", pa.float64()),
+        ("genres", pa.list_(pa.string())),
+        ("director", pa.string()),
+        ("rating", pa.float64()),
+        ("vote_count", pa.float64()),
+    ])),
+])
+
 def build_corpus_row(row):
-    genres = ", ".join(row["genres"]) if isinstance(row["genres"], list) else ""
-    cast = ", ".join(row["cast_top"]) if isinstance(row["cast_top"], list) else ""
-    keywords = ", ".join(row["keywords"]) if isinstance(row["keywords"], list) else ""
+    genres = ", ".join(row.genres) if isinstance(row.genres, list) else ""
+    cast = ", ".join(row.cast_top) if isinstance(row.cast_top, list) else ""
+    keywords = ", ".join(row.keywords) if isinstance(row.keywords, list) else ""
     text = (
-        f"Title: {row['title']} ({int(row['year']) if not np.isnan(row['year']) else 'Unknown'})\n"
+        f"Title: {row.title} ({int(row.year) if not np.isnan(row.year) else 'Unknown'})\n"
         f"Genres: {genres}\n"
-        f"Director: {row['director']}\n"
+        f"Director: {row.director}\n"
         f"Cast: {cast}\n"
         f"Keywords: {keywords}\n"
-        f"Rating: {round(row['weighted_rating'], 2)}\n"
-        f"Overview: {row['overview']}"
+        f"Rating: {round(row.weighted_rating, 2)}\n"
+        f"Overview: {row.overview}"
     )
     meta = {
-        "title": row["title"],
-        "year": row["year"],
-        "genres": row["genres"],
-        "director": row["director"],
-        "rating": row["weighted_rating"],
-        "vote_count": row["vote_count"],
+        "id": row.id,
+        "title": row.title,
+        "year": row.year,
+        "genres": row.genres,
+        "director": row.director if isinstance(row.director, str) else None,
+        "rating": row.weighted_rating,
+        "vote_count": row.vote_count,
     }
     return {"page_content": text, "metadata": meta}
 
-corpus = df.apply(build_corpus_row, axis=1).to_list()
-corpus_path = os.path.join(BASE, "embeddings_corpus.jsonl")
-with open(corpus_path, "w", encoding="utf-8") as f:
-    for rec in corpus:
-        f.write(json.dumps(rec) + "\n")
+corpus_cols = ["id", "title", "year", "genres", "director", "cast_top", "keywords",
+               "weighted_rating", "vote_count", "overview"]
+CorpusRow = namedtuple("CorpusRow", corpus_cols)
+# Plain object arrays: zip over them skips pandas' per-row tuple construction
+corpus = [
+    build_corpus_row(CorpusRow(*values))
+    for values in zip(*(df[col].to_numpy(dtype=object) for col in corpus_cols))
+]
+corpus_path = os.path.join(BASE, "embeddings_corpus.parquet")
+pq.write_table(pa.Table.from_pylist(corpus, schema=CORPUS_SCHEMA), corpus_path, compression="zstd")
 
 print(f"✅ Embedding corpus saved to {corpus_path}")
 print("🎉 Data build completed successfully — master dataset and corpus ready!")
@@ -5,6 +5,8 @@
 
 import streamlit as st
 import os, sys, json
+import asyncio
+import threading
 
 # Ensure project root is in path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -13,6 +15,14 @@ from agent.coordinator import run_cinemind_pipeline
 
 st.set_page_config(page_title="🎬 CineMind", page_icon="🎥", layout="wide")
 
+
+# Long-lived background event loop so pooled async connections survive reruns
+@st.cache_resource
+def get_event_loop():
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return loop
+
 # === Header ===
 st.title("🎬 CineMind — Your AI Movie Curator")
 st.markdown(
@@ -33,7 +43,8 @@ user_query = st.text_input("🎤 Ask CineMind something like:",
 if st.button("✨ Recommend") or user_query:
     with st.spinner("CineMind is thinking..."):
         try:
-            result = run_cinemind_pipeline(user_query)
+            future = asyncio.run_coroutine_threadsafe(run_cinemind_pipeline(user_query), get_event_loop())
+            result = future.result()
             st.session_state.history.append({"query": user_query, "result": result})
         except Exception as e:
             st.error(f"⚠️ Error: {e}")
@@ -1,54 +1,250 @@
 # validate_master_dataset.py
 # -------------------------------------------------------------
 # 🎯 Purpose: Perform detailed sanity checks on movies_master.parquet
-# and ensure embeddings_corpus.jsonl integrity.
+# and ensure embeddings_corpus.parquet integrity.
 
 import pandas as pd
 import numpy as np
-import json
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 import os
+import mmap
+import heapq
+from operator import itemgetter
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
 
 BASE = "data"
 master_path = os.path.join(BASE, "movies_master.parquet")
-corpus_path = os.path.join(BASE, "embeddings_corpus.jsonl")
+corpus_path = os.path.join(BASE, "embeddings_corpus.parquet")
+legacy_corpus_path = os.path.join(BASE, "embeddings_corpus.jsonl")
+legacy_count_path = legacy_corpus_path + ".count"  # cached line count
+# Decoded master columns, cached as LZ4 Arrow IPC for repeat runs (the stream
+# variant of Feather v2: director's dictionary may change between batches)
+master_cache_path = os.path.join(BASE, "_validate_cache.arrows")
+COUNT_WINDOW_BYTES = 8 << 20  # bytes compared per NumPy pass (bounds the temporary mask)
+COUNT_WORKERS = min(8, os.cpu_count() or 1)  # DRAM bandwidth saturates well before core count
 
-# === Load master dataset ===
-df = pd.read_parquet(master_path)
-print(f"✅ Loaded master dataset with {len(df)} rows and {len(df.columns)} columns.\n")
+# Only the columns the checks below use are decoded; missing-value ratios cover
+# every column, from footer statistics where the file has them
+MASTER_COLUMNS = ["id", "title", "vote_average", "vote_count", "weighted_rating",
+                  "user_rating_mean", "genres", "director"]
+RATING_COLS = ["vote_average", "vote_count", "weighted_rating", "user_rating_mean"]
+BATCH_ROWS = 100_000  # rows decoded at a time; bounds peak memory
+GENRES_TYPE = pa.list_(pa.string())  # the one layout the genre checks assume
+
+# Let Arrow decode row groups and hash columns on every core
+pa.set_cpu_count(os.cpu_count() or 1)
+
+
+def _count_window(data, start):
+    """Newline bytes in one COUNT_WINDOW_BYTES slice of a uint8 view."""
+    return int(np.count_nonzero(data[start:start + COUNT_WINDOW_BYTES] == ord("\n")))
+
+
+def count_newlines(path):
+    """Counts newline bytes straight from a read-only mmap (no copies into user buffers),
+    with the windows spread over a thread pool (NumPy releases the GIL while comparing)."""
+    if os.path.getsize(path) == 0:
+        return 0  # empty files cannot be mapped
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if hasattr(mmap, "MADV_SEQUENTIAL"):
+            mm.madvise(mmap.MADV_SEQUENTIAL)  # aggressive kernel readahead
+        # The uint8 view lives only in the partial, so it is released before the map closes
+        with ThreadPoolExecutor(max_workers=COUNT_WORKERS) as pool:
+            lines = sum(pool.map(partial(_count_window, np.frombuffer(mm, dtype=np.uint8)),
+                                 range(0, len(mm), COUNT_WINDOW_BYTES)))
+    return lines
+
+
+def footer_null_counts(parquet_file):
+    """Per-column null counts summed over row-group statistics (footer only, no data
+    pages). Nested columns (leaf stats count elements, not rows) and columns written
+    without statistics are left out, for the caller to decode."""
+    meta = parquet_file.metadata
+    leaf_index = {meta.schema.column(j).path: j for j in range(meta.num_columns)}
+    counts = {}
+    for name in parquet_file.schema_arrow.names:
+        j = leaf_index.get(name)
+        if j is None:
+            continue
+        total = 0
+        for i in range(meta.num_row_groups):
+            column_stats = meta.row_group(i).column(j).statistics
+            if column_stats is None or not column_stats.has_null_count:
+                break
+            total += column_stats.null_count
+        else:
+            counts[name] = total
+    return counts
+
+
+def id_digest(ids):
+    """Order-independent 64-bit digest of a batch of ids (sum of per-id hashes, mod 2**64),
+    so digests of separate batches add up to the digest of the whole column."""
+    ids = pc.cast(ids.drop_null(), pa.int64()).to_numpy()
+    return int(pd.util.hash_array(ids).sum(dtype=np.uint64))
+
+
+def master_batches():
+    """Yields the master columns batch by batch — from the IPC cache while it is
+    newer than the Parquet file, otherwise from Parquet (refreshing the cache)."""
+    if (os.path.exists(master_cache_path)
+            and os.path.getmtime(master_cache_path) > os.path.getmtime(master_path)):
+        with pa.memory_map(master_cache_path) as source:
+            try:
+                reader = pa.ipc.open_stream(source)
+            except pa.ArrowInvalid:
+                reader = None  # empty or truncated cache: rebuild it from Parquet
+            if (reader is not None and reader.schema.names == MASTER_COLUMNS
+                    and reader.schema.field("genres").type == GENRES_TYPE):
+                yield from reader
+                return
+
+    # pre_buffer coalesces each row group's selected column chunks into few large
+    # parallel reads. Only director's validity bitmap is used, so it stays
+    # dictionary-encoded (int32 codes + one copy of each name).
+    master = pq.ParquetFile(master_path, read_dictionary=["director"], pre_buffer=True)
+    tmp_path = master_cache_path + ".tmp"
+    writer = None
+    with pa.OSFile(tmp_path, "wb") as sink:
+        for batch in master.iter_batches(batch_size=BATCH_ROWS, columns=MASTER_COLUMNS, use_threads=True):
+            # Coerce genres (list / large_list, any string flavour) to GENRES_TYPE once, on load
+            batch = pa.RecordBatch.from_arrays(
+                [col.cast(GENRES_TYPE) if name == "genres" else col
+                 for name, col in zip(batch.schema.names, batch.columns)],
+                names=batch.schema.names,
+            )
+            if writer is None:
+                writer = pa.ipc.new_stream(sink, batch.schema, options=pa.ipc.IpcWriteOptions(compression="lz4"))
+            writer.write_batch(batch)
+            yield batch
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        os.unlink(tmp_path)  # no batches, no schema: an empty stream would not be readable
+    else:
+        os.replace(tmp_path, master_cache_path)
+
+
+# === Scan master dataset (streamed batch by batch; no full table in memory) ===
+master_file = pq.ParquetFile(master_path)
+master_schema = master_file.schema_arrow
+
+
+def accumulate(acc, name, col):
+    """Folds one batch of a column into its running statistics."""
+    acc["nulls"] += col.null_count  # kept in Arrow metadata, no data scan
+    if name == "id":
+        acc.setdefault("uniques", []).append(pc.unique(col))  # nulls kept once
+        acc["digest"] = (acc.get("digest", 0) + id_digest(col)) % 2**64
+    if name == "title":
+        # Only 64-bit fingerprints of each batch's distinct titles are kept, not the strings
+        acc.setdefault("hashes", []).append(pd.util.hash_array(pc.unique(col).to_numpy(zero_copy_only=False)))
+    if name == "genres":
+        # Lengths come straight from the offsets buffer (null lists are skipped → 0)
+        acc["length_sum"] = acc.get("length_sum", 0) + (pc.sum(pc.list_value_length(col)).as_py() or 0)
+    if name in RATING_COLS:
+        # Exact quartiles need the values; only the rating columns are kept, as Arrow arrays
+        acc.setdefault("values", []).append(col)
+
+
+n_rows = 0
+stats = {name: {"nulls": 0} for name in MASTER_COLUMNS}
+for batch in master_batches():
+    n_rows += batch.num_rows
+    for name, col in zip(batch.schema.names, batch.columns):
+        accumulate(stats[name], name, col)
+
+stats["id"]["distinct"] = len(pc.unique(
+    pa.chunked_array(stats["id"].pop("uniques", []), type=master_schema.field("id").type)
+))
+stats["title"]["distinct"] = len(np.unique(
+    np.concatenate(stats["title"].pop("hashes", [np.empty(0, dtype=np.uint64)]))
+))
+print(f"✅ Loaded master dataset with {n_rows} rows and {len(master_schema)} columns.\n")
 
 # === 1️⃣ Check uniqueness ===
-duplicate_ids = df["id"].duplicated().sum()
+duplicate_ids = n_rows - stats["id"]["distinct"]
 print(f"Duplicate movie IDs: {duplicate_ids}")
 
-duplicate_titles = df["title"].duplicated().sum()
+duplicate_titles = n_rows - stats["title"]["distinct"]
 print(f"Duplicate movie titles: {duplicate_titles}\n")
 
 # === 2️⃣ Missing data stats ===
-missing_summary = df.isna().mean().sort_values(ascending=False)
+# Per-column null counts (no boolean frame): scanned columns from the pass above, the
+# rest from the Parquet footer; only columns without usable statistics are decoded
+null_counts = footer_null_counts(master_file)
+null_counts.update({name: s["nulls"] for name, s in stats.items()})
+undecoded = [name for name in master_schema.names if name not in null_counts]
+for name in undecoded:
+    null_counts[name] = 0
+if undecoded:
+    for batch in master_file.iter_batches(batch_size=BATCH_ROWS, columns=undecoded, use_threads=True):
+        for name, col in zip(batch.schema.names, batch.columns):
+            null_counts[name] += col.null_count
+# A 10-item heap picks the worst columns
+missing = {name: null_counts[name] / max(n_rows, 1) for name in master_schema.names}
+missing_summary = pd.Series(dict(heapq.nlargest(10, missing.items(), key=itemgetter(1))))
 print("🔍 Missing value ratios (top 10):")
-print(missing_summary.head(10), "\n")
+print(missing_summary, "\n")
 
 # === 3️⃣ Descriptive stats for ratings ===
-rating_cols = ["vote_average", "vote_count", "weighted_rating", "user_rating_mean"]
-desc = df[rating_cols].describe()
+def describe_column(acc, field):
+    """describe()-style summary straight from Arrow aggregate kernels: nulls are
+    skipped via the validity bitmap, so no NaN-filled copy or mask is built."""
+    values = pa.chunked_array(acc.pop("values", []), type=field.type)
+    min_max = pc.min_max(values)
+    quartiles = pc.quantile(values, q=[0.25, 0.5, 0.75], interpolation="linear").to_pylist()
+    return [
+        n_rows - acc["nulls"],  # non-null count from Arrow's validity bitmaps
+        pc.mean(values).as_py(),
+        pc.stddev(values, ddof=1).as_py(),
+        min_max["min"].as_py(),
+        *(quartiles or [None] * 3),
+        min_max["max"].as_py(),
+    ]
+
+
+desc = pd.DataFrame(
+    {c: describe_column(stats[c], master_schema.field(c)) for c in RATING_COLS},
+    index=["count", "mean", "std", "min", "25%", "50%", "75%", "max"],
+    dtype="float64",
+)
 print("🎯 Rating distribution summary:")
 print(desc, "\n")
 
 # === 4️⃣ Genre & Director coverage ===
-def safe_len(x):
-    if isinstance(x, (list, np.ndarray)):
-        return len(x)
-    return 0
-
-genre_coverage = df["genres"].apply(safe_len).mean()
-
-director_coverage = df["director"].notna().mean()
+genre_coverage = stats["genres"].get("length_sum", 0) / max(n_rows, 1)
+director_coverage = 1 - stats["director"]["nulls"] / max(n_rows, 1)
 print(f"Average #genres per movie: {genre_coverage:.2f}")
 print(f"Director coverage: {director_coverage*100:.1f}%\n")
 
 # === 5️⃣ Verify corpus alignment ===
-corpus_lines = sum(1 for _ in open(corpus_path, "r", encoding="utf-8"))
-if corpus_lines == len(df):
-    print(f"✅ Embedding corpus alignment OK — {corpus_lines} records match master dataset.")
+corpus_digest = None
+if os.path.exists(corpus_path):
+    corpus_file = pq.ParquetFile(corpus_path)
+    corpus_lines = corpus_file.metadata.num_rows  # footer only, no data pages
+    # Corpora built with movie ids: digest them to check it is the same set of movies
+    if "id" in [f.name for f in corpus_file.schema_arrow.field("metadata").type]:
+        corpus_digest = 0
+        for batch in corpus_file.iter_batches(batch_size=BATCH_ROWS, columns=["metadata.id"]):
+            corpus_digest = (corpus_digest + id_digest(batch.column(0).field("id"))) % 2**64
+else:
+    # Corpora built before the switch to Parquet have no footer; the line count is
+    # cached in a sidecar, trusted only while it is newer than the corpus itself
+    if (os.path.exists(legacy_count_path)
+            and os.path.getmtime(legacy_count_path) >= os.path.getmtime(legacy_corpus_path)):
+        with open(legacy_count_path, "r", encoding="utf-8") as f:
+            corpus_lines = int(f.read())
+    else:
+        corpus_lines = count_newlines(legacy_corpus_path)
+        with open(legacy_count_path, "w", encoding="utf-8") as f:
+            f.write(str(corpus_lines))
+if corpus_lines != n_rows:
+    print(f"⚠️ Corpus size mismatch: {corpus_lines} vs {n_rows} rows in master dataset.")
+elif corpus_digest is not None and corpus_digest != stats["id"].get("digest", 0):
+    print(f"⚠️ Corpus id mismatch: {corpus_lines} records, but not the same movie ids as the master dataset.")
 else:
-    print(f"⚠️ Corpus size mismatch: {corpus_lines} vs {len(df)} rows in master dataset.")
+    print(f"✅ Embedding corpus alignment OK — {corpus_lines} records match master dataset.")